@@ -1,22 +1,46 @@
 from __future__ import annotations
 
+import atexit
+import copy
+import functools
+import hashlib
 import json
+import mmap
 import os
+import queue
+import re
+import select
+import selectors
 import shutil
 import signal
+import stat
 import subprocess
 import tarfile
 import tempfile
 import threading
 import time
 import urllib.request
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
-from flask import Flask, abort, flash, redirect, render_template, request, url_for
+from flask import Flask, abort, flash, jsonify, redirect, render_template, request, send_file, session, url_for
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask_caching import Cache
+except ImportError:
+    Cache = None
 
 app = Flask(__name__)
 app.secret_key = "frpmanager-dev"
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 3600
+page_cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"}) if Cache is not None else None
+PAGE_CACHE_TIMEOUT = 1
 
 ROOT = Path(__file__).resolve().parent
 SETTINGS_FILE = ROOT / "settings.json"
@@ -25,6 +49,11 @@ SYSTEMD_UNIT_PREFIX = "frp"
 SYSTEMD_ENV_PATH = "PATH=/root/.local/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
 FRP_DEFAULT_VERSION = "0.67.0"
 FRP_ARCHES = ("amd64", "arm64")
+FRP_BINARY_NAMES = frozenset({"frpc", "frps"})
+EDIT_INLINE_LIMIT = 64 * 1024
+SETTINGS_MMAP_THRESHOLD = 1024 * 1024
+INSTANCE_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+INSTANCE_ID_INVALID_RE = re.compile(r"[^A-Za-z0-9_-]")
 
 
 DEFAULT_SETTINGS = {
@@ -53,39 +82,132 @@ FRPS_TEMPLATE = """bindPort = 7000
 """
 
 class ServiceState:
-    def __init__(self) -> None:
-        self.process: Optional[int] = None
+    def __init__(self, instance_id: Optional[str] = None) -> None:
+        self.lock = threading.Lock()
+        self.instance_id = instance_id
+        self.process: Optional[subprocess.Popen] = None
+        self.pidfd: Optional[int] = None
         self.desired_running: bool = False
+        # Launch command cached from settings; config_path None means not resolved yet.
+        self.config_path: Optional[str] = None
+        self.command: Optional[list[str]] = None
         self.last_exit_code: Optional[int] = None
         self.last_error: str = ""
-        self.monitor_thread: Optional[threading.Thread] = None
+        # Last known liveness, kept current by start/stop and the supervisor.
+        self.running: bool = False
+        self.last_status: Dict[str, Any] = {"running": False, "desired": False, "error": ""}
 
 
-SERVICE_LOCK = threading.Lock()
+# Guards FRPC_STATES membership only; each ServiceState has its own lock.
+_REGISTRY_LOCK = threading.Lock()
 FRPS_STATE = ServiceState()
 FRPC_STATES: Dict[str, ServiceState] = {}
 
+# One supervisor thread waits on every child's pidfd (plus a wake-up pipe).
+SUPERVISOR = selectors.DefaultSelector()
+_SUPERVISOR_WAKE_R, _SUPERVISOR_WAKE_W = os.pipe()
+os.set_blocking(_SUPERVISOR_WAKE_R, False)
+os.set_blocking(_SUPERVISOR_WAKE_W, False)
+SUPERVISOR.register(_SUPERVISOR_WAKE_R, selectors.EVENT_READ, None)
+_SUPERVISOR_LOCK = threading.Lock()
+_SUPERVISOR_THREAD: Optional[threading.Thread] = None
+_WATCHED: set[ServiceState] = set()
+
+# Parsed settings keyed by settings.json (mtime_ns, size); None means "file absent".
+# While "dirty" the cache is newer than the file and is served as-is.
+# "digest" is the sha256 of what settings.json holds, used to skip no-op writes.
+_SETTINGS_CACHE: Dict[str, Any] = {"stat": None, "data": None, "generation": 0, "dirty": False, "digest": None}
+_SETTINGS_CACHE_LOCK = threading.Lock()
+_SETTINGS_TRANSACTION_LOCK = threading.RLock()
+_SETTINGS_WRITE_LOCK = threading.Lock()
+_SAVE_QUEUE: "queue.Queue[None]" = queue.Queue()
+_SAVE_WORKER: Optional[threading.Thread] = None
+
+# directory -> ((mtime_ns, nlink), checked_at, files); see list_toml_files.
+_TOML_CACHE: Dict[Path, Tuple[Tuple[int, int], float, list[Path]]] = {}
+TOML_CACHE_TTL = 2.0
+
+# unit name -> (checked_at, info); shared by every status render and /api/status poll.
+_SYSTEMD_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_SYSTEMD_CACHE_LOCK = threading.Lock()
+SYSTEMD_QUERY_TTL = 5.0
+
+
+def _json_loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _read_settings_json() -> Any:
+    with SETTINGS_FILE.open("rb") as f:
+        # Small files are faster to read() outright; mmap only pays off once settings grow.
+        if os.fstat(f.fileno()).st_size < SETTINGS_MMAP_THRESHOLD:
+            return _json_loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson is None:
+                return json.loads(bytes(mm))
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _settings_stat() -> Optional[Tuple[int, int]]:
+    # Size as well as mtime: two writes inside one mtime tick rarely keep the same length.
+    try:
+        st = SETTINGS_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-def load_settings() -> Dict[str, Any]:
-    if SETTINGS_FILE.exists():
-        with SETTINGS_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    settings = {**DEFAULT_SETTINGS, **data}
 
-    if not settings.get("managed_dirs"):
-        settings["managed_dirs"] = [str(ROOT)]
-    if not settings.get("current_dir"):
-        settings["current_dir"] = settings["managed_dirs"][0]
+def load_settings() -> Dict[str, Any]:
+    with _SETTINGS_CACHE_LOCK:
+        # stat under the lock so it cannot straddle the writer's replace + clean.
+        file_stat = _settings_stat()
+        if _SETTINGS_CACHE["data"] is not None and (_SETTINGS_CACHE["dirty"] or _SETTINGS_CACHE["stat"] == file_stat):
+            return copy.deepcopy(_SETTINGS_CACHE["data"])
+        generation = _SETTINGS_CACHE["generation"]
+
+    # settings.json changed behind our back; symlinked dirs may have moved too.
+    _resolve_dir.cache_clear()
+    try:
+        settings = _parse_settings()
+    except ValueError as exc:
+        app.logger.error("settings.json 解析失败: %s", exc)
+        # A hand edit or foreign writer left invalid JSON; keep serving the last good copy.
+        # No digest forces the next save to rewrite the file; the broken file's stat stops
+        # every request from re-parsing it until it changes again.
+        with _SETTINGS_CACHE_LOCK:
+            if _SETTINGS_CACHE["data"] is not None:
+                _SETTINGS_CACHE["digest"] = None
+                _SETTINGS_CACHE["stat"] = file_stat
+                return copy.deepcopy(_SETTINGS_CACHE["data"])
+        raise
+    digest = _settings_digest(settings)
+    with _SETTINGS_CACHE_LOCK:
+        if _SETTINGS_CACHE["generation"] != generation:
+            # A save landed while we were parsing; it is newer than the file.
+            return copy.deepcopy(_SETTINGS_CACHE["data"])
+        _SETTINGS_CACHE["stat"] = file_stat
+        _SETTINGS_CACHE["data"] = copy.deepcopy(settings)
+        _SETTINGS_CACHE["digest"] = digest
+    _refresh_commands(settings)
+    return settings
 
-    if "services" not in settings:
-        settings["services"] = DEFAULT_SETTINGS["services"].copy()
-    settings["services"].setdefault("frps", {"config": ""})
-    settings["services"]["frps"]["config"] = str(_frps_config_path(settings))
 
-    if "frpc_instances" not in settings or not isinstance(settings["frpc_instances"], list):
-        settings["frpc_instances"] = []
+def _parse_settings() -> Dict[str, Any]:
+    try:
+        data = _read_settings_json()
+    except FileNotFoundError:
+        data = {}
+    settings = _fill_defaults(data)
+    _sync_frps_config(settings)
 
     # Migration: old single frpc config -> instance
     legacy = settings.get("services", {}).get("frpc", {}).get("config")
@@ -98,10 +220,140 @@ def load_settings() -> Dict[str, Any]:
     return settings
 
 
-def save_settings(settings: Dict[str, Any]) -> None:
+def _fill_defaults(settings: Dict[str, Any]) -> Dict[str, Any]:
+    # In place, and only missing keys get a (fresh) copy of the default: a shallow
+    # merge would hand out DEFAULT_SETTINGS' own lists and dicts to be mutated.
+    for key, value in DEFAULT_SETTINGS.items():
+        if key not in settings:
+            settings[key] = copy.deepcopy(value)
+    settings["managed_dirs"] = dict.fromkeys(settings["managed_dirs"] or [str(ROOT)])
+    if not settings["current_dir"]:
+        settings["current_dir"] = next(iter(settings["managed_dirs"]))
+    settings["services"].setdefault("frps", {"config": ""})
+    if not isinstance(settings["frpc_instances"], list):
+        settings["frpc_instances"] = []
+    return settings
+
+
+def _queue_save() -> None:
+    # The cache is already committed; the disk write happens on the save worker.
+    global _SAVE_WORKER
+    with _SETTINGS_CACHE_LOCK:
+        if _SAVE_WORKER is None or not _SAVE_WORKER.is_alive():
+            _SAVE_WORKER = threading.Thread(target=_save_worker, daemon=True)
+            _SAVE_WORKER.start()
+    _SAVE_QUEUE.put(None)
+
+
+def _commit_settings(settings: Dict[str, Any]) -> None:
+    # Takes ownership: the caller hands the dict over and never touches it again.
     _normalize_instances(settings)
-    with SETTINGS_FILE.open("w", encoding="utf-8") as f:
-        json.dump(settings, f, ensure_ascii=False, indent=2)
+    # Keep the derived frps config in sync, the cache skips re-deriving it.
+    _sync_frps_config(settings)
+    with _SETTINGS_CACHE_LOCK:
+        _SETTINGS_CACHE["data"] = settings
+        _SETTINGS_CACHE["generation"] += 1
+        _SETTINGS_CACHE["dirty"] = True
+    _refresh_commands(settings)
+
+
+def _save_worker() -> None:
+    while True:
+        _SAVE_QUEUE.get()
+        # Coalesce a burst of saves into one write of the latest settings.
+        try:
+            while True:
+                _SAVE_QUEUE.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            _flush_settings()
+        except Exception as exc:
+            app.logger.error("写入 settings.json 失败: %s", exc)
+
+
+def _settings_digest(settings: Dict[str, Any]) -> bytes:
+    return hashlib.sha256(_settings_payload(settings)).digest()
+
+
+def _flush_settings() -> None:
+    with _SETTINGS_WRITE_LOCK:
+        with _SETTINGS_CACHE_LOCK:
+            if not _SETTINGS_CACHE["dirty"]:
+                return
+            data = _SETTINGS_CACHE["data"]
+            generation = _SETTINGS_CACHE["generation"]
+            previous = _SETTINGS_CACHE["digest"]
+        payload = _settings_payload(data)
+        digest = hashlib.sha256(payload).digest()
+        written = digest != previous or not SETTINGS_FILE.exists()
+        if written:
+            _write_atomic(SETTINGS_FILE, payload)
+        with _SETTINGS_CACHE_LOCK:
+            if written:
+                # The file now holds this payload even if newer settings are already queued.
+                _SETTINGS_CACHE["digest"] = digest
+            if _SETTINGS_CACHE["generation"] == generation:
+                _SETTINGS_CACHE["stat"] = _settings_stat()
+                _SETTINGS_CACHE["dirty"] = False
+
+
+atexit.register(_flush_settings)
+
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    # Write then rename so readers never see a half-written file.
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fchmod(f.fileno(), mode)
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself, not just the file contents.
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+@contextmanager
+def settings_transaction() -> Iterator[Dict[str, Any]]:
+    # One copy per transaction: the private copy from load_settings becomes the new cache.
+    # If the body raises, nothing is committed and the cache keeps the old settings.
+    with _SETTINGS_TRANSACTION_LOCK:
+        settings = load_settings()
+        yield settings
+        _commit_settings(settings)
+        _queue_save()
+
+
+def _settings_payload(settings: Dict[str, Any]) -> bytes:
+    persisted = _persisted_settings(settings)
+    # managed_dirs is an ordered dict in memory (O(1) membership) but a list on disk.
+    persisted["managed_dirs"] = list(settings["managed_dirs"])
+    return _json_dumps(persisted)
+
+
+def _persisted_settings(value: Any) -> Any:
+    # Underscore keys are derived at load time and never written to disk.
+    if isinstance(value, dict):
+        return {k: _persisted_settings(v) for k, v in value.items() if not str(k).startswith("_")}
+    if isinstance(value, list):
+        return [_persisted_settings(v) for v in value]
+    return value
 
 
 def _normalize_instances(settings: Dict[str, Any]) -> None:
@@ -110,14 +362,32 @@ def _normalize_instances(settings: Dict[str, Any]) -> None:
         inst_id = str(item.get("id", "")).strip()
         if not inst_id:
             continue
-        unique[inst_id] = {"id": inst_id, "config": str(item.get("config", "")).strip()}
+        config = str(item.get("config", "")).strip()
+        unique[inst_id] = {"id": inst_id, "config": config, "_config_resolved": _resolved_path_str(config)}
     settings["frpc_instances"] = list(unique.values())
+    settings["_frpc_index"] = unique
 
 
 def _frps_config_path(settings: Dict[str, Any]) -> Path:
     return current_dir(settings) / "frps.toml"
 
 
+def _sync_frps_config(settings: Dict[str, Any]) -> None:
+    frps = settings["services"]["frps"]
+    frps["config"] = str(_frps_config_path(settings))
+    frps["_config_resolved"] = _resolved_path_str(frps["config"])
+
+
+def _resolved_path_str(path_str: str) -> str:
+    # Resolved once per settings load so hot paths can compare plain strings.
+    if not path_str:
+        return ""
+    try:
+        return str(Path(path_str).resolve())
+    except Exception:
+        return path_str
+
+
 def _systemd_unit_name_frps() -> str:
     return f"{SYSTEMD_UNIT_PREFIX}-frps.service"
 
@@ -143,6 +413,24 @@ def _systemd_run(args: list[str]) -> Tuple[int, str, str]:
 
 
 def _systemd_query(unit_name: str) -> Dict[str, Any]:
+    # Each query forks systemctl twice; open tabs poll, so reuse a recent answer.
+    now = time.monotonic()
+    with _SYSTEMD_CACHE_LOCK:
+        cached = _SYSTEMD_CACHE.get(unit_name)
+    if cached and now - cached[0] < SYSTEMD_QUERY_TTL:
+        return dict(cached[1])
+    info = _systemd_query_uncached(unit_name)
+    with _SYSTEMD_CACHE_LOCK:
+        _SYSTEMD_CACHE[unit_name] = (now, info)
+    return dict(info)
+
+
+def _forget_systemd_unit(unit_name: str) -> None:
+    with _SYSTEMD_CACHE_LOCK:
+        _SYSTEMD_CACHE.pop(unit_name, None)
+
+
+def _systemd_query_uncached(unit_name: str) -> Dict[str, Any]:
     info = {"exists": False, "active": False, "enabled": False, "error": ""}
     if not _systemd_unit_path(unit_name).exists():
         return info
@@ -171,6 +459,7 @@ def _systemd_action(unit_name: str, action: str, extra_args: Optional[list[str]]
         args.extend(extra_args)
     args.append(unit_name)
     code, _, err = _systemd_run(args)
+    _forget_systemd_unit(unit_name)
     if code != 0:
         return err or f"systemctl {action} 失败"
     return None
@@ -208,6 +497,7 @@ def _write_systemd_unit(unit_name: str, content: str) -> Optional[str]:
         _systemd_unit_path(unit_name).write_text(content, encoding="utf-8")
     except Exception as exc:
         return str(exc)
+    _forget_systemd_unit(unit_name)
     if _systemd_available():
         code, _, err = _systemd_run(["systemctl", "daemon-reload"])
         if code != 0:
@@ -261,9 +551,12 @@ def _find_frp_binaries(dest: Path, preferred_root: Optional[Path] = None) -> Tup
     frps_path = None
     frpc_path = None
     for item in search_root.rglob("*"):
-        if item.is_file() and item.name == "frps":
+        # Name check first: only the two candidates pay for the is_file() stat.
+        if item.name not in FRP_BINARY_NAMES or not item.is_file():
+            continue
+        if item.name == "frps":
             frps_path = item
-        elif item.is_file() and item.name == "frpc":
+        else:
             frpc_path = item
         if frps_path and frpc_path:
             break
@@ -271,13 +564,22 @@ def _find_frp_binaries(dest: Path, preferred_root: Optional[Path] = None) -> Tup
 
 
 def safe_dir(path_str: str) -> Optional[Path]:
+    # Resolution is memoized; the stat still runs so a removed directory is noticed.
+    p = _resolve_dir(path_str)
+    if p is None:
+        return None
     try:
-        p = Path(path_str).expanduser().resolve()
-    except Exception:
+        return p if stat.S_ISDIR(os.stat(p).st_mode) else None
+    except OSError:
         return None
-    if not p.exists() or not p.is_dir():
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_dir(path_str: str) -> Optional[Path]:
+    try:
+        return Path(os.path.realpath(os.path.expanduser(path_str)))
+    except Exception:
         return None
-    return p
 
 
 def resolve_new_dir(path_str: str, base: Path) -> Optional[Path]:
@@ -296,19 +598,38 @@ def resolve_new_dir(path_str: str, base: Path) -> Optional[Path]:
 def current_dir(settings: Dict[str, Any]) -> Path:
     p = safe_dir(settings.get("current_dir", ""))
     if p is None:
-        p = safe_dir(settings["managed_dirs"][0])
+        p = safe_dir(next(iter(settings["managed_dirs"])))
     return p
 
 
 def list_toml_files(directory: Path) -> list[Path]:
-    return sorted([p for p in directory.iterdir() if p.is_file() and p.suffix.lower() == ".toml"])
+    # Our own file changes invalidate explicitly, so within the TTL even the stat is skipped;
+    # after it, mtime/nlink catch entries added, removed or renamed by anyone else.
+    now = time.monotonic()
+    cached = _TOML_CACHE.get(directory)
+    if cached and now - cached[1] < TOML_CACHE_TTL:
+        return cached[2]
+    st = directory.stat()
+    key = (st.st_mtime_ns, st.st_nlink)
+    if cached and cached[0] == key:
+        _TOML_CACHE[directory] = (key, now, cached[2])
+        return cached[2]
+    with os.scandir(directory) as it:
+        found = [e.path for e in it if e.name.lower().endswith(".toml") and e.is_file()]
+    # Sort the plain strings (same order as Path) and only then build Path objects.
+    found.sort()
+    files = [Path(p) for p in found]
+    _TOML_CACHE[directory] = (key, now, files)
+    return files
+
+
+def _forget_toml_listing(file_path: Path) -> None:
+    _TOML_CACHE.pop(file_path.parent, None)
 
 
 def ensure_in_dir(file_path: Path, directory: Path) -> bool:
-    try:
-        return directory in file_path.resolve().parents
-    except Exception:
-        return False
+    # Callers pass resolved paths, so containment is a plain prefix check.
+    return str(file_path).startswith(os.path.join(str(directory), ""))
 
 
 def ensure_in_managed_dirs(file_path: Path, settings: Dict[str, Any]) -> bool:
@@ -333,26 +654,18 @@ def build_command(binary: str, config_path: str) -> Optional[list[str]]:
     return [binary, "-c", config_path]
 
 
-def _pid_exists(pid: int) -> bool:
-    try:
-        os.kill(pid, 0)
-    except OSError:
-        return False
-    return True
-
-
 def is_running(state: ServiceState) -> bool:
-    if state.process is None:
-        return False
-    pid = int(state.process)
-    return Path(f"/proc/{pid}").exists() if Path("/proc").exists() else _pid_exists(pid)
+    # Popen.poll() reaps the child, so a crashed process never looks alive as a zombie.
+    return state.process is not None and state.process.poll() is None
 
 
-def _start_process(binary: str, config_path: str, state: ServiceState) -> None:
-    if not config_path:
+def _start_process(state: ServiceState) -> None:
+    if state.config_path is None:
+        _refresh_command(state, load_settings())
+    command = state.command
+    if not state.config_path:
         state.last_error = "请先选择配置文件"
         return
-    command = build_command(binary, config_path)
     if not command:
         state.last_error = "请先设置程序路径"
         return
@@ -366,108 +679,256 @@ def _start_process(binary: str, config_path: str, state: ServiceState) -> None:
     except Exception as exc:
         state.last_error = f"启动失败: {exc}"
         return
-    state.process = proc.pid
+    _close_pidfd(state)
+    state.process = proc
+    state.pidfd = _open_pidfd(proc.pid)
+    if state.pidfd is not None:
+        try:
+            SUPERVISOR.register(state.pidfd, selectors.EVENT_READ, state)
+        except (KeyError, ValueError, OSError):
+            _close_pidfd(state)
+    if state.pidfd is None and not _SIGCHLD_WAKES_SUPERVISOR:
+        # No pidfd or SIGCHLD hook: block in waitpid() on a helper thread instead.
+        threading.Thread(target=_wait_child, args=(proc,), daemon=True).start()
+    state.running = True
     state.last_error = ""
 
 
+def _wait_child(proc: subprocess.Popen) -> None:
+    proc.wait()
+    _wake_supervisor()
+
+
 def _stop_process(state: ServiceState) -> None:
-    if state.process is None:
-        return
+    _stop_processes([state])
+
+
+def _stop_service(state: ServiceState) -> None:
+    state.desired_running = False
+    _stop_process(state)
+    # Let the supervisor drop it from the watch set now rather than on its next wake-up.
+    _wake_supervisor()
+
+
+def _stop_processes(states: list[ServiceState]) -> None:
+    # Signal everything first so the total wait is the slowest child, not the sum.
+    running = [s for s in states if s.process is not None]
+    for state in running:
+        _signal_process(state, signal.SIGTERM)
+    stubborn = _wait_processes(running, 2.0)
+    for state in stubborn:
+        _signal_process(state, signal.SIGKILL)
+    _wait_processes(stubborn, 1.0)
+    for state in running:
+        state.last_exit_code = state.process.returncode
+    for state in states:
+        state.process = None
+        state.running = False
+        _close_pidfd(state)
+
+
+def _signal_process(state: ServiceState, sig: int) -> None:
+    # Signalling through the pidfd cannot hit a recycled pid.
+    if state.pidfd is not None:
+        try:
+            signal.pidfd_send_signal(state.pidfd, sig)
+            return
+        except ProcessLookupError:
+            return
+        except (AttributeError, OSError):
+            pass
     try:
-        os.kill(int(state.process), signal.SIGTERM)
+        state.process.send_signal(sig)
     except Exception:
         pass
-    state.process = None
+
+
+def _wait_processes(states: list[ServiceState], timeout: float) -> list[ServiceState]:
+    deadline = time.monotonic() + timeout
+    pending = [s for s in states if s.process.poll() is None]
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        pidfds = [s.pidfd for s in pending if s.pidfd is not None]
+        if len(pidfds) == len(pending):
+            try:
+                poller = select.poll()
+                for pidfd in pidfds:
+                    poller.register(pidfd, select.POLLIN)
+                poller.poll(int(remaining * 1000) + 1)
+            except OSError:
+                time.sleep(min(0.05, remaining))
+        else:
+            time.sleep(min(0.05, remaining))
+        pending = [s for s in pending if s.process.poll() is None]
+    return pending
+
+
+def _open_pidfd(pid: int) -> Optional[int]:
+    # pidfd_open needs Linux >= 5.3; without it the supervisor falls back to polling.
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def _close_pidfd(state: ServiceState) -> None:
+    if state.pidfd is None:
+        return
+    try:
+        SUPERVISOR.unregister(state.pidfd)
+    except (KeyError, ValueError):
+        pass
+    try:
+        os.close(state.pidfd)
+    except OSError:
+        pass
+    state.pidfd = None
 
 
 def _ensure_frpc_state(instance_id: str) -> ServiceState:
-    if instance_id not in FRPC_STATES:
-        FRPC_STATES[instance_id] = ServiceState()
-    return FRPC_STATES[instance_id]
+    state = FRPC_STATES.get(instance_id)
+    if state is None:
+        with _REGISTRY_LOCK:
+            state = FRPC_STATES.setdefault(instance_id, ServiceState(instance_id))
+    return state
 
 
 def _start_frps() -> None:
-    settings = load_settings()
-    config_path = settings["services"]["frps"].get("config", "")
-    binary = service_path(settings, "frps")
-    _start_process(binary, config_path, FRPS_STATE)
+    _start_process(FRPS_STATE)
 
 
 def _start_frpc(instance_id: str) -> None:
-    settings = load_settings()
-    instance = _find_instance(settings, instance_id)
-    if not instance:
-        return
-    binary = service_path(settings, "frpc")
-    _start_process(binary, instance.get("config", ""), _ensure_frpc_state(instance_id))
+    _start_process(_ensure_frpc_state(instance_id))
+
+
+def _refresh_command(state: ServiceState, settings: Dict[str, Any]) -> None:
+    if state.instance_id is None:
+        config_path = settings["services"]["frps"].get("config", "")
+        binary = service_path(settings, "frps")
+    else:
+        instance = _find_instance(settings, state.instance_id)
+        config_path = instance.get("config", "") if instance else ""
+        binary = service_path(settings, "frpc")
+    state.command = build_command(binary, config_path) if config_path else None
+    state.config_path = config_path
+
+
+def _refresh_commands(settings: Dict[str, Any]) -> None:
+    # Called whenever settings change, so (re)starts never need to load settings.
+    with _REGISTRY_LOCK:
+        states = [FRPS_STATE, *FRPC_STATES.values()]
+    for state in states:
+        _refresh_command(state, settings)
+    if any(s.desired_running and s.process is None for s in states):
+        # A failed start may be fixable by this change; retry now instead of on the next 1.5s tick.
+        _wake_supervisor()
 
 
 def _find_instance(settings: Dict[str, Any], instance_id: str) -> Optional[Dict[str, str]]:
-    for item in settings.get("frpc_instances", []):
-        if item.get("id") == instance_id:
-            return item
-    return None
+    return settings.get("_frpc_index", {}).get(instance_id)
 
 
-def _monitor_frps() -> None:
-    while True:
-        time.sleep(1.5)
-        with SERVICE_LOCK:
-            if not FRPS_STATE.desired_running:
-                if FRPS_STATE.process is not None:
-                    _stop_process(FRPS_STATE)
-                continue
-            if not is_running(FRPS_STATE):
-                FRPS_STATE.process = None
-                _start_frps()
-
-
-def _monitor_frpc(instance_id: str) -> None:
-    state = _ensure_frpc_state(instance_id)
+def _lock_order(state: ServiceState) -> Tuple[bool, str]:
+    # Anything taking several service locks takes them frps first, then frpc by id.
+    return state.instance_id is not None, state.instance_id or ""
+
+
+def _restart_service(state: ServiceState) -> None:
+    if state.instance_id is None:
+        _start_frps()
+    else:
+        _start_frpc(state.instance_id)
+
+
+def _check_service(state: ServiceState) -> None:
+    with state.lock:
+        if not state.desired_running:
+            _stop_process(state)
+            with _SUPERVISOR_LOCK:
+                _WATCHED.discard(state)
+            return
+        if not is_running(state):
+            if state.process is not None:
+                state.last_exit_code = state.process.returncode
+            state.process = None
+            state.running = False
+            _close_pidfd(state)
+            _restart_service(state)
+
+
+def _supervise() -> None:
     while True:
-        time.sleep(1.5)
-        with SERVICE_LOCK:
-            if not state.desired_running:
-                if state.process is not None:
-                    _stop_process(state)
-                continue
-            if not is_running(state):
-                state.process = None
-                _start_frpc(instance_id)
-
-
-def _ensure_monitor_frps() -> None:
-    if FRPS_STATE.monitor_thread and FRPS_STATE.monitor_thread.is_alive():
-        return
-    t = threading.Thread(target=_monitor_frps, daemon=True)
-    FRPS_STATE.monitor_thread = t
-    t.start()
+        with _SUPERVISOR_LOCK:
+            watched = list(_WATCHED)
+        # Every child reports its exit; only failed starts need a timed retry.
+        polling = any(s.desired_running and s.process is None for s in watched)
+        exited = []
+        for key, _ in SUPERVISOR.select(1.5 if polling else None):
+            if key.data is None:
+                try:
+                    while os.read(_SUPERVISOR_WAKE_R, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            else:
+                exited.append(key.data)
+        for state in dict.fromkeys(exited + watched):
+            if state in exited or state.pidfd is None or not state.desired_running:
+                _check_service(state)
 
 
-def _ensure_monitor_frpc(instance_id: str) -> None:
-    state = _ensure_frpc_state(instance_id)
-    if state.monitor_thread and state.monitor_thread.is_alive():
-        return
-    t = threading.Thread(target=_monitor_frpc, args=(instance_id,), daemon=True)
-    state.monitor_thread = t
-    t.start()
+def _ensure_supervisor(state: ServiceState) -> None:
+    global _SUPERVISOR_THREAD
+    with _SUPERVISOR_LOCK:
+        _WATCHED.add(state)
+        if _SUPERVISOR_THREAD is None or not _SUPERVISOR_THREAD.is_alive():
+            _SUPERVISOR_THREAD = threading.Thread(target=_supervise, daemon=True)
+            _SUPERVISOR_THREAD.start()
+    _wake_supervisor()
 
 
-def _validate_instance_id(instance_id: str) -> bool:
-    if not instance_id:
+def _wake_supervisor() -> None:
+    try:
+        os.write(_SUPERVISOR_WAKE_W, b"\0")
+    except OSError:
+        pass
+
+
+def _install_sigchld_wakeup() -> bool:
+    # Only needed when pidfds are unavailable; the supervisor then reaps via Popen.poll().
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+        return False
+    except (AttributeError, OSError):
+        pass
+    if not hasattr(signal, "SIGCHLD") or threading.current_thread() is not threading.main_thread():
         return False
-    allowed = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_")
-    return all(ch in allowed for ch in instance_id)
+    previous = signal.getsignal(signal.SIGCHLD)
+
+    def _on_sigchld(signum: int, frame: Any) -> None:
+        _wake_supervisor()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGCHLD, _on_sigchld)
+    return True
+
+
+_SIGCHLD_WAKES_SUPERVISOR = _install_sigchld_wakeup()
+
+
+def _validate_instance_id(instance_id: str) -> bool:
+    return INSTANCE_ID_RE.fullmatch(instance_id) is not None
 
 
 def _sanitize_instance_id(raw: str) -> str:
-    allowed = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_")
-    cleaned = "".join(ch if ch in allowed else "-" for ch in raw)
-    return cleaned.strip("-_")
+    return INSTANCE_ID_INVALID_RE.sub("-", raw).strip("-_")
 
 
 def _unique_instance_id(settings: Dict[str, Any], base_id: str) -> str:
-    existing = {i.get("id") for i in settings.get("frpc_instances", [])}
+    existing = settings.get("_frpc_index", {})
     if base_id not in existing:
         return base_id
     idx = 2
@@ -476,7 +937,34 @@ def _unique_instance_id(settings: Dict[str, Any], base_id: str) -> str:
     return f"{base_id}-{idx}"
 
 
+@app.url_defaults
+def _static_version(endpoint: str, values: Dict[str, Any]) -> None:
+    # Static files get a long max-age, so version their URLs by mtime to bust it on upgrade.
+    if endpoint != "static" or "filename" not in values:
+        return
+    try:
+        values["v"] = os.stat(os.path.join(app.static_folder, values["filename"])).st_mtime_ns
+    except OSError:
+        pass
+
+
+def _cached_page(view: Callable[..., Any]) -> Callable[..., Any]:
+    # Bursts of refreshes within a second share one render. Pages with pending
+    # flashes are never cached: the render consumes them and must not replay.
+    if page_cache is None:
+        return view
+    return page_cache.cached(timeout=PAGE_CACHE_TIMEOUT, unless=lambda: "_flashes" in session)(view)
+
+
+@app.after_request
+def _expire_pages(response: Any) -> Any:
+    if page_cache is not None and request.method == "POST":
+        page_cache.clear()
+    return response
+
+
 @app.route("/")
+@_cached_page
 def index() -> str:
     settings = load_settings()
     directory = current_dir(settings)
@@ -486,23 +974,22 @@ def index() -> str:
         settings=settings,
         directory=directory,
         files=files,
-        states=_service_status(),
+        states=_service_status(settings),
     )
 
 
 @app.route("/set-dir", methods=["POST"])
 def set_dir() -> Any:
-    settings = load_settings()
     path_str = request.form.get("dir", "")
+    _resolve_dir.cache_clear()
     p = safe_dir(path_str)
     if p is None:
         flash("目录无效", "error")
         return redirect(url_for("index"))
     p_str = str(p)
-    if p_str not in settings["managed_dirs"]:
-        settings["managed_dirs"].append(p_str)
-    settings["current_dir"] = p_str
-    save_settings(settings)
+    with settings_transaction() as settings:
+        settings["managed_dirs"].setdefault(p_str)
+        settings["current_dir"] = p_str
     flash("已切换目录", "success")
     return redirect(url_for("index"))
 
@@ -524,26 +1011,25 @@ def create_dir() -> Any:
     except Exception as exc:
         flash(f"创建失败: {exc}", "error")
         return redirect(url_for("index"))
+    _resolve_dir.cache_clear()
     p_str = str(p)
-    if p_str not in settings["managed_dirs"]:
-        settings["managed_dirs"].append(p_str)
-    settings["current_dir"] = p_str
-    save_settings(settings)
+    with settings_transaction() as settings:
+        settings["managed_dirs"].setdefault(p_str)
+        settings["current_dir"] = p_str
     flash("已创建并切换目录", "success")
     return redirect(url_for("index"))
 
 
 @app.route("/remove-dir", methods=["POST"])
 def remove_dir() -> Any:
-    settings = load_settings()
     path_str = request.form.get("dir", "")
-    if path_str in settings["managed_dirs"]:
-        settings["managed_dirs"].remove(path_str)
-    if not settings["managed_dirs"]:
-        settings["managed_dirs"] = [str(ROOT)]
-    if settings["current_dir"] == path_str:
-        settings["current_dir"] = settings["managed_dirs"][0]
-    save_settings(settings)
+    with settings_transaction() as settings:
+        settings["managed_dirs"].pop(path_str, None)
+        if not settings["managed_dirs"]:
+            settings["managed_dirs"] = {str(ROOT): None}
+        if settings["current_dir"] == path_str:
+            settings["current_dir"] = next(iter(settings["managed_dirs"]))
+    _resolve_dir.cache_clear()
     flash("已移除目录", "success")
     return redirect(url_for("index"))
 
@@ -573,14 +1059,14 @@ def create_file() -> Any:
     except Exception as exc:
         flash(f"创建失败: {exc}", "error")
         return redirect(url_for("index"))
+    _forget_toml_listing(file_path)
     flash("已创建配置文件", "success")
     return redirect(url_for("edit_file", filename=name))
 
 
 @app.route("/delete-file", methods=["POST"])
 def delete_file() -> Any:
-    settings = load_settings()
-    directory = current_dir(settings)
+    directory = current_dir(load_settings())
     name = request.form.get("filename", "").strip()
     file_path = (directory / name).resolve()
     if not file_path.exists() or not ensure_in_dir(file_path, directory):
@@ -590,11 +1076,13 @@ def delete_file() -> Any:
     except Exception as exc:
         flash(f"删除失败: {exc}", "error")
         return redirect(url_for("index"))
+    _forget_toml_listing(file_path)
     # Clear bindings if any instance uses it
-    for inst in settings.get("frpc_instances", []):
-        if inst.get("config") and Path(inst["config"]).resolve() == file_path:
-            inst["config"] = ""
-    save_settings(settings)
+    with settings_transaction() as settings:
+        target = str(file_path)
+        for inst in settings.get("frpc_instances", []):
+            if inst.get("config") and inst.get("_config_resolved") == target:
+                inst["config"] = ""
     flash("已删除配置文件", "success")
     return redirect(url_for("index"))
 
@@ -606,17 +1094,40 @@ def edit_file(filename: str) -> str:
     file_path = (directory / filename).resolve()
     if not file_path.exists() or not ensure_in_dir(file_path, directory):
         abort(404)
-    content = file_path.read_text(encoding="utf-8")
+    # Large configs are fetched from /raw by the page instead of being escaped inline.
+    inline = file_path.stat().st_size <= EDIT_INLINE_LIMIT
+    content = _read_editable(file_path) if inline else ""
     return render_template(
         "edit.html",
         settings=settings,
         directory=directory,
         filename=filename,
-        content=content,
-        states=_service_status(),
+        content=content or "",
+        editable=content is not None,
+        raw_url=None if inline else url_for("raw_file", filename=filename),
+        states=_service_status(settings),
     )
 
 
+def _read_editable(file_path: Path) -> Optional[str]:
+    # Strict decode: a lossy one would write U+FFFD back over the original bytes on save.
+    try:
+        return file_path.read_bytes().decode("utf-8")
+    except UnicodeDecodeError:
+        flash("文件不是有效的 UTF-8 编码，已以只读方式打开", "error")
+        return None
+
+
+@app.route("/raw/<path:filename>")
+def raw_file(filename: str) -> Any:
+    settings = load_settings()
+    directory = current_dir(settings)
+    file_path = (directory / filename).resolve()
+    if not file_path.is_file() or not ensure_in_dir(file_path, directory):
+        abort(404)
+    return send_file(file_path, mimetype="text/plain", max_age=0)
+
+
 @app.route("/save/<path:filename>", methods=["POST"])
 def save_file(filename: str) -> Any:
     settings = load_settings()
@@ -626,32 +1137,32 @@ def save_file(filename: str) -> Any:
         abort(403)
     content = request.form.get("content", "")
     file_path.write_text(content, encoding="utf-8")
+    _forget_toml_listing(file_path)
     flash("已保存", "success")
 
-    with SERVICE_LOCK:
-        # Restart frps if using this config
-        frps_cfg = settings["services"]["frps"].get("config", "")
-        if frps_cfg and Path(frps_cfg).resolve() == file_path:
-            unit_name = _systemd_unit_name_frps()
+    target = str(file_path)
+    # Restart frps and frpc instances using this config
+    services = []
+    if settings["services"]["frps"].get("_config_resolved") == target:
+        services.append((FRPS_STATE, _systemd_unit_name_frps()))
+    for inst in settings.get("frpc_instances", []):
+        if inst.get("config") and inst.get("_config_resolved") == target:
+            services.append((_ensure_frpc_state(inst["id"]), _systemd_unit_name_frpc(inst["id"])))
+
+    with ExitStack() as stack:
+        for state in sorted({state for state, _ in services}, key=_lock_order):
+            stack.enter_context(state.lock)
+        to_restart = []
+        for state, unit_name in services:
             unit_info = _systemd_query(unit_name)
             if unit_info["exists"] and unit_info["active"]:
                 _systemd_action(unit_name, "restart")
-            elif FRPS_STATE.desired_running:
-                _stop_process(FRPS_STATE)
-                _start_frps()
-
-        # Restart frpc instances using this config
-        for inst in settings.get("frpc_instances", []):
-            cfg = inst.get("config", "")
-            if cfg and Path(cfg).resolve() == file_path:
-                state = _ensure_frpc_state(inst["id"])
-                unit_name = _systemd_unit_name_frpc(inst["id"])
-                unit_info = _systemd_query(unit_name)
-                if unit_info["exists"] and unit_info["active"]:
-                    _systemd_action(unit_name, "restart")
-                elif state.desired_running:
-                    _stop_process(state)
-                    _start_frpc(inst["id"])
+            elif state.desired_running:
+                to_restart.append(state)
+        # Stop all of them before starting any, instead of stop/start one by one.
+        _stop_processes(to_restart)
+        for state in to_restart:
+            _restart_service(state)
 
     return redirect(url_for("edit_file", filename=filename))
 
@@ -666,13 +1177,15 @@ def frps_edit() -> str:
         except Exception as exc:
             flash(f"创建 frps 配置失败: {exc}", "error")
             return redirect(url_for("service_page"))
-    content = file_path.read_text(encoding="utf-8")
+        _forget_toml_listing(file_path)
+    content = _read_editable(file_path)
     return render_template(
         "frps_edit.html",
         settings=settings,
         filename=file_path.name,
-        content=content,
-        states=_service_status(),
+        content=content or "",
+        editable=content is not None,
+        states=_service_status(settings),
     )
 
 
@@ -682,10 +1195,11 @@ def frps_save() -> Any:
     file_path = _frps_config_path(settings)
     content = request.form.get("content", "")
     file_path.write_text(content, encoding="utf-8")
-    settings["services"]["frps"]["config"] = str(file_path)
-    save_settings(settings)
+    _forget_toml_listing(file_path)
+    with settings_transaction() as settings:
+        settings["services"]["frps"]["config"] = str(file_path)
     flash("frps 配置已保存", "success")
-    with SERVICE_LOCK:
+    with FRPS_STATE.lock:
         unit_info = _systemd_query(_systemd_unit_name_frps())
         if unit_info["exists"] and unit_info["active"]:
             error = _systemd_action(_systemd_unit_name_frps(), "restart")
@@ -698,6 +1212,7 @@ def frps_save() -> Any:
 
 
 @app.route("/service")
+@_cached_page
 def service_page() -> str:
     settings = load_settings()
     directory = current_dir(settings)
@@ -707,7 +1222,7 @@ def service_page() -> str:
         "service.html",
         settings=settings,
         directory=directory,
-        states=_service_status(),
+        states=_service_status(settings),
         files=list_toml_files(directory),
         frps_config_path=_frps_config_path(settings),
         release_version=version,
@@ -716,29 +1231,31 @@ def service_page() -> str:
     )
 
 
+@app.route("/api/status")
+def api_status() -> Any:
+    return jsonify(_service_status(load_settings()))
+
+
 @app.route("/service/update", methods=["POST"])
 def service_update() -> Any:
-    settings = load_settings()
-    settings["frpc_path"] = request.form.get("frpc_path", "").strip()
-    settings["frps_path"] = request.form.get("frps_path", "").strip()
-    save_settings(settings)
+    with settings_transaction() as settings:
+        settings["frpc_path"] = request.form.get("frpc_path", "").strip()
+        settings["frps_path"] = request.form.get("frps_path", "").strip()
     flash("已保存程序路径", "success")
     return redirect(url_for("service_page"))
 
 
 @app.route("/service/frps/set-config", methods=["POST"])
 def frps_set_config() -> Any:
-    settings = load_settings()
-    config_path = _frps_config_path(settings)
-    settings["services"]["frps"]["config"] = str(config_path)
-    save_settings(settings)
+    with settings_transaction() as settings:
+        settings["services"]["frps"]["config"] = str(_frps_config_path(settings))
     flash("已绑定 frps 配置", "success")
     return redirect(url_for("service_page"))
 
 
 @app.route("/service/frps/start", methods=["POST"])
 def frps_start() -> Any:
-    with SERVICE_LOCK:
+    with FRPS_STATE.lock:
         unit_name = _systemd_unit_name_frps()
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "enable", ["--now"])
@@ -748,7 +1265,7 @@ def frps_start() -> Any:
                 flash("frps 已通过 systemd 启动并设为开机自启", "success")
                 return redirect(url_for("service_page"))
         FRPS_STATE.desired_running = True
-        _ensure_monitor_frps()
+        _ensure_supervisor(FRPS_STATE)
         _start_frps()
     flash("frps 已启动/守护", "success")
     return redirect(url_for("service_page"))
@@ -756,7 +1273,7 @@ def frps_start() -> Any:
 
 @app.route("/service/frps/stop", methods=["POST"])
 def frps_stop() -> Any:
-    with SERVICE_LOCK:
+    with FRPS_STATE.lock:
         unit_name = _systemd_unit_name_frps()
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "disable", ["--now"])
@@ -765,15 +1282,14 @@ def frps_stop() -> Any:
             else:
                 flash("frps 已通过 systemd 停止并取消开机自启", "success")
                 return redirect(url_for("service_page"))
-        FRPS_STATE.desired_running = False
-        _stop_process(FRPS_STATE)
+        _stop_service(FRPS_STATE)
     flash("frps 已停止", "success")
     return redirect(url_for("service_page"))
 
 
 @app.route("/service/frps/restart", methods=["POST"])
 def frps_restart() -> Any:
-    with SERVICE_LOCK:
+    with FRPS_STATE.lock:
         unit_name = _systemd_unit_name_frps()
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "restart")
@@ -784,7 +1300,7 @@ def frps_restart() -> Any:
                 return redirect(url_for("service_page"))
         FRPS_STATE.desired_running = True
         _stop_process(FRPS_STATE)
-        _ensure_monitor_frps()
+        _ensure_supervisor(FRPS_STATE)
         _start_frps()
     flash("frps 已重启", "success")
     return redirect(url_for("service_page"))
@@ -819,31 +1335,32 @@ def frpc_add() -> Any:
     if not _validate_instance_id(instance_id):
         flash("实例名仅支持字母/数字/-/_", "error")
         return redirect(url_for("service_page"))
-    if _find_instance(settings, instance_id):
-        instance_id = _unique_instance_id(settings, instance_id)
     if config_path:
         cfg = Path(config_path).expanduser().resolve()
         if not cfg.exists():
             flash("配置文件不存在", "error")
             return redirect(url_for("service_page"))
         config_path = str(cfg)
-    settings["frpc_instances"].append({"id": instance_id, "config": config_path})
-    save_settings(settings)
+    with settings_transaction() as settings:
+        if _find_instance(settings, instance_id):
+            instance_id = _unique_instance_id(settings, instance_id)
+        settings["frpc_instances"].append({"id": instance_id, "config": config_path})
     flash("已添加实例", "success")
     return redirect(url_for("service_page"))
 
 
 @app.route("/service/frpc/remove", methods=["POST"])
 def frpc_remove() -> Any:
-    settings = load_settings()
     instance_id = request.form.get("instance_id", "").strip()
-    settings["frpc_instances"] = [i for i in settings["frpc_instances"] if i.get("id") != instance_id]
-    save_settings(settings)
-    with SERVICE_LOCK:
+    with settings_transaction() as settings:
+        index = settings["_frpc_index"]
+        if index.pop(instance_id, None) is not None:
+            settings["frpc_instances"] = list(index.values())
+    with _REGISTRY_LOCK:
         state = FRPC_STATES.pop(instance_id, None)
-        if state:
-            state.desired_running = False
-            _stop_process(state)
+    if state:
+        with state.lock:
+            _stop_service(state)
     flash("已移除实例", "success")
     return redirect(url_for("service_page"))
 
@@ -868,8 +1385,10 @@ def frpc_set_config() -> Any:
         if not cfg.exists():
             flash("配置文件不存在", "error")
             return redirect(url_for("service_page"))
-        instance["config"] = str(cfg)
-        save_settings(settings)
+        with settings_transaction() as settings:
+            instance = _find_instance(settings, instance_id)
+            if instance:
+                instance["config"] = str(cfg)
         flash("已更新配置文件", "success")
     return redirect(url_for("service_page"))
 
@@ -887,11 +1406,11 @@ def frpc_delete_config() -> Any:
         return redirect(url_for("service_page"))
     file_path = Path(cfg_path)
     if not file_path.exists():
-        instance["config"] = ""
-        save_settings(settings)
+        _clear_instance_config(instance_id)
         flash("配置文件已不存在，已清除绑定", "success")
         return redirect(url_for("service_page"))
-    if not ensure_in_dir(file_path, current_dir(settings)):
+    # Resolve now, not from the load-time cache: the unlink below acts on the live path.
+    if not ensure_in_dir(file_path.resolve(), current_dir(settings)):
         flash("仅允许删除当前目录内的配置文件", "error")
         return redirect(url_for("service_page"))
     try:
@@ -899,24 +1418,31 @@ def frpc_delete_config() -> Any:
     except Exception as exc:
         flash(f"删除失败: {exc}", "error")
         return redirect(url_for("service_page"))
-    instance["config"] = ""
-    save_settings(settings)
-    with SERVICE_LOCK:
-        state = _ensure_frpc_state(instance_id)
+    _forget_toml_listing(file_path)
+    _clear_instance_config(instance_id)
+    state = _ensure_frpc_state(instance_id)
+    with state.lock:
         if state.desired_running:
-            state.desired_running = False
-            _stop_process(state)
+            _stop_service(state)
     flash("已删除配置文件并停止实例", "success")
     return redirect(url_for("service_page"))
 
 
+def _clear_instance_config(instance_id: str) -> None:
+    with settings_transaction() as settings:
+        instance = _find_instance(settings, instance_id)
+        if instance:
+            instance["config"] = ""
+
+
 @app.route("/service/frpc/start", methods=["POST"])
 def frpc_start() -> Any:
     settings = load_settings()
     instance_id = request.form.get("instance_id", "").strip()
     if not _find_instance(settings, instance_id):
         abort(404)
-    with SERVICE_LOCK:
+    state = _ensure_frpc_state(instance_id)
+    with state.lock:
         unit_name = _systemd_unit_name_frpc(instance_id)
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "enable", ["--now"])
@@ -925,9 +1451,8 @@ def frpc_start() -> Any:
             else:
                 flash("frpc 实例已通过 systemd 启动并设为开机自启", "success")
                 return redirect(url_for("service_page"))
-        state = _ensure_frpc_state(instance_id)
         state.desired_running = True
-        _ensure_monitor_frpc(instance_id)
+        _ensure_supervisor(state)
         _start_frpc(instance_id)
     flash("frpc 实例已启动/守护", "success")
     return redirect(url_for("service_page"))
@@ -936,7 +1461,8 @@ def frpc_start() -> Any:
 @app.route("/service/frpc/stop", methods=["POST"])
 def frpc_stop() -> Any:
     instance_id = request.form.get("instance_id", "").strip()
-    with SERVICE_LOCK:
+    state = _ensure_frpc_state(instance_id)
+    with state.lock:
         unit_name = _systemd_unit_name_frpc(instance_id)
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "disable", ["--now"])
@@ -945,9 +1471,7 @@ def frpc_stop() -> Any:
             else:
                 flash("frpc 实例已通过 systemd 停止并取消开机自启", "success")
                 return redirect(url_for("service_page"))
-        state = _ensure_frpc_state(instance_id)
-        state.desired_running = False
-        _stop_process(state)
+        _stop_service(state)
     flash("frpc 实例已停止", "success")
     return redirect(url_for("service_page"))
 
@@ -955,7 +1479,8 @@ def frpc_stop() -> Any:
 @app.route("/service/frpc/restart", methods=["POST"])
 def frpc_restart() -> Any:
     instance_id = request.form.get("instance_id", "").strip()
-    with SERVICE_LOCK:
+    state = _ensure_frpc_state(instance_id)
+    with state.lock:
         unit_name = _systemd_unit_name_frpc(instance_id)
         if _systemd_unit_path(unit_name).exists():
             error = _systemd_action(unit_name, "restart")
@@ -964,10 +1489,9 @@ def frpc_restart() -> Any:
             else:
                 flash("frpc 实例已通过 systemd 重启", "success")
                 return redirect(url_for("service_page"))
-        state = _ensure_frpc_state(instance_id)
         state.desired_running = True
         _stop_process(state)
-        _ensure_monitor_frpc(instance_id)
+        _ensure_supervisor(state)
         _start_frpc(instance_id)
     flash("frpc 实例已重启", "success")
     return redirect(url_for("service_page"))
@@ -1007,7 +1531,7 @@ def systemd_frpc_install() -> Any:
     if not config_path:
         flash("请先为该实例设置配置文件", "error")
         return redirect(url_for("service_page"))
-    if not ensure_in_dir(Path(config_path), current_dir(settings)):
+    if not ensure_in_dir(Path(config_path).resolve(), current_dir(settings)):
         flash("该实例配置不在当前目录，无法生成 systemd 单元", "error")
         return redirect(url_for("service_page"))
     unit_name = _systemd_unit_name_frpc(instance_id)
@@ -1053,9 +1577,9 @@ def frp_install() -> Any:
         if not frps_path or not frpc_path:
             flash("解压完成，但未找到 frps/frpc 可执行文件", "error")
             return redirect(url_for("service_page"))
-        settings["frps_path"] = str(frps_path)
-        settings["frpc_path"] = str(frpc_path)
-        save_settings(settings)
+        with settings_transaction() as settings:
+            settings["frps_path"] = str(frps_path)
+            settings["frpc_path"] = str(frpc_path)
         flash("已下载安装并自动填充路径", "success")
     except Exception as exc:
         flash(f"安装失败: {exc}", "error")
@@ -1068,18 +1592,33 @@ def frp_install() -> Any:
     return redirect(url_for("service_page"))
 
 
-def _service_status() -> Dict[str, Any]:
-    settings = load_settings()
+def _process_status(state: ServiceState) -> Dict[str, Any]:
+    # Never wait on a service lock: while a start/stop holds it, report the last snapshot.
+    if not state.lock.acquire(blocking=False):
+        return state.last_status
+    try:
+        state.last_status = {
+            "running": state.running,
+            "desired": state.desired_running,
+            "error": state.last_error,
+        }
+        return state.last_status
+    finally:
+        state.lock.release()
+
+
+def _service_status(settings: Dict[str, Any]) -> Dict[str, Any]:
     frps_unit = _systemd_unit_name_frps()
     frps_systemd = _systemd_query(frps_unit)
+    frps_process = _process_status(FRPS_STATE)
     frpc_list = []
     for inst in settings.get("frpc_instances", []):
         instance_id = inst.get("id", "")
-        state = _ensure_frpc_state(instance_id)
+        process = _process_status(_ensure_frpc_state(instance_id))
         unit_name = _systemd_unit_name_frpc(instance_id)
         unit_info = _systemd_query(unit_name)
-        running = unit_info["active"] if unit_info["exists"] else is_running(state)
-        desired = unit_info["enabled"] if unit_info["exists"] else state.desired_running
+        running = unit_info["active"] if unit_info["exists"] else process["running"]
+        desired = unit_info["enabled"] if unit_info["exists"] else process["desired"]
         frpc_list.append(
             {
                 "id": instance_id,
@@ -1087,7 +1626,7 @@ def _service_status() -> Dict[str, Any]:
                 "desired": desired,
                 "config": inst.get("config", ""),
                 "path": settings.get("frpc_path", ""),
-                "error": unit_info["error"] if unit_info["exists"] else state.last_error,
+                "error": unit_info["error"] if unit_info["exists"] else process["error"],
                 "unit_name": unit_name,
                 "unit_exists": unit_info["exists"],
                 "systemd_active": unit_info["active"],
@@ -1098,11 +1637,11 @@ def _service_status() -> Dict[str, Any]:
 
     return {
         "frps": {
-            "running": frps_systemd["active"] if frps_systemd["exists"] else is_running(FRPS_STATE),
-            "desired": frps_systemd["enabled"] if frps_systemd["exists"] else FRPS_STATE.desired_running,
+            "running": frps_systemd["active"] if frps_systemd["exists"] else frps_process["running"],
+            "desired": frps_systemd["enabled"] if frps_systemd["exists"] else frps_process["desired"],
             "config": settings["services"]["frps"].get("config", ""),
             "path": settings.get("frps_path", ""),
-            "error": frps_systemd["error"] if frps_systemd["exists"] else FRPS_STATE.last_error,
+            "error": frps_systemd["error"] if frps_systemd["exists"] else frps_process["error"],
             "unit_name": frps_unit,
             "unit_exists": frps_systemd["exists"],
             "systemd_active": frps_systemd["active"],
@@ -1114,4 +1653,13 @@ def _service_status() -> Dict[str, Any]:
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5005, debug=True)
+    if os.environ.get("FRPMANAGER_DEV"):
+        app.run(host="0.0.0.0", port=5005, debug=True)
+    else:
+        try:
+            from waitress import serve
+        except ImportError:
+            app.run(host="0.0.0.0", port=5005, threaded=True)
+        else:
+            # Single process on purpose: service state lives in this process's memory.
+            serve(app, host="0.0.0.0", port=5005, threads=8)
@@ -0,0 +1,32 @@
+(function () {
+  const area = document.querySelector("textarea[data-src]");
+  if (!area) {
+    return;
+  }
+  const button = area.form.querySelector("button[type=submit]");
+
+  async function load() {
+    try {
+      const resp = await fetch(area.dataset.src, { cache: "no-store" });
+      if (!resp.ok) {
+        throw new Error(String(resp.status));
+      }
+      let text;
+      try {
+        // fatal: a lossy decode would save U+FFFD over the original bytes.
+        text = new TextDecoder("utf-8", { fatal: true }).decode(await resp.arrayBuffer());
+      } catch (err) {
+        area.placeholder = "文件不是有效的 UTF-8 编码，无法在线编辑";
+        return;
+      }
+      area.value = text;
+      area.readOnly = false;
+      button.disabled = false;
+    } catch (err) {
+      // Leave saving disabled so an empty textarea never overwrites the file.
+      area.placeholder = "加载失败，请刷新重试";
+    }
+  }
+
+  load();
+})();
@@ -0,0 +1,42 @@
+(function () {
+  const script = document.currentScript;
+  const url = script.dataset.url;
+  const interval = Number(script.dataset.interval || 5000);
+  const labels = {
+    running: (v) => (v ? "运行中" : "未运行"),
+    desired: (v) => (v ? "是" : "否"),
+    unit_exists: (v) => (v ? "已安装" : "未安装"),
+    error: (v) => v || "",
+  };
+
+  function apply(key, info) {
+    document.querySelectorAll(`[data-service="${CSS.escape(key)}"]`).forEach((el) => {
+      const format = labels[el.dataset.field];
+      if (format) {
+        el.textContent = format(info[el.dataset.field]);
+        if (el.dataset.field === "error") {
+          el.hidden = !el.textContent;
+        }
+      }
+    });
+  }
+
+  async function refresh() {
+    if (document.hidden) {
+      return;
+    }
+    try {
+      const resp = await fetch(url, { cache: "no-store" });
+      if (!resp.ok) {
+        return;
+      }
+      const data = await resp.json();
+      apply("frps", data.frps);
+      data.frpc_instances.forEach((inst) => apply(`frpc:${inst.id}`, inst));
+    } catch (err) {
+      // Keep the last rendered state; the next tick retries.
+    }
+  }
+
+  setInterval(refresh, interval);
+})();